@@ -1,12 +1,15 @@
-import streamlit as st
-from skimage import io
 import numpy as np
-# from brisque import BRISQUE # No longer needed
 import argparse
 from PIL import Image, UnidentifiedImageError # For saving and reading JPEGs, and accessing Q tables
 import os
 import io as BytesIOModule # To handle byte streams for Pillow
 import re
+import functools
+import glob
+import hashlib
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
 
 # Standard luminance quantization table (often used for quality 50 in libjpeg)
 # This is a reference point; actual tables vary by encoder and quality setting.
@@ -22,123 +25,341 @@ STANDARD_LUMINANCE_TABLE = np.array([
     72,  92,  95,  98, 112, 100, 103,  99
 ])
 
-def get_jpeg_quality_from_qtable(image_path_or_bytes):
-    """Estimates JPEG quality based on quantization tables."""
+# Precomputed once at import: the standard table is a constant, so there is no
+# need to rebuild the mask and filtered view on every call.
+_STD_NONZERO_MASK = STANDARD_LUMINANCE_TABLE != 0
+_STD_FLAT_FILTERED = STANDARD_LUMINANCE_TABLE[_STD_NONZERO_MASK].astype(np.uint32)
+
+# N. Robidoux's luminance table from ImageMagick, the default base table in mozjpeg.
+ROBIDOUX_LUMINANCE_TABLE = np.array([
+    16,  16,  16,  18,  25,  37,  56,  85,
+    16,  17,  20,  27,  34,  40,  53,  75,
+    16,  20,  24,  31,  43,  62,  91, 135,
+    18,  27,  31,  40,  53,  74, 106, 156,
+    25,  34,  43,  53,  69,  94, 131, 189,
+    37,  40,  62,  74,  94, 124, 169, 238,
+    56,  53,  91, 106, 131, 169, 226, 311,
+    85,  75, 135, 156, 189, 238, 311, 418
+])
+
+def _scale_table(base_table, quality):
+    """Scales a base table the way libjpeg/mozjpeg do for a quality setting (baseline, 8-bit)."""
+    scale = 5000 // quality if quality < 50 else 200 - quality * 2
+    return np.clip((base_table * scale + 50) // 100, 1, 255).astype(np.uint8)
+
+# Every stock libjpeg luminance table; row q - 1 holds the table for quality q.
+_STD_SCALED_TABLES = np.stack([_scale_table(STANDARD_LUMINANCE_TABLE, quality) for quality in range(1, 101)])
+
+def _build_q_from_dc():
+    """Builds a LUT from the DC entry of a stock libjpeg luminance table to its quality."""
+    q_from_dc = np.zeros(256, dtype=np.uint8)
+    for quality in range(1, 101):
+        q_from_dc[_STD_SCALED_TABLES[quality - 1, 0]] = quality
+    # Forward-fill DC values no stock table produces; the caller's table comparison rejects them
+    last_filled = np.maximum.accumulate(np.where(q_from_dc > 0, np.arange(256), 0))
+    return np.maximum(q_from_dc[last_filled], 1)
+
+_Q_FROM_DC = _build_q_from_dc()
+
+# Raw bytes of every stock libjpeg and mozjpeg luminance table -> its quality setting.
+# Files from these encoders match exactly, so no estimation is needed for them.
+# Qualities run downwards so that where the lowest settings saturate to the same
+# table, the lowest quality is the one kept.
+_KNOWN_TABLES = {
+    _scale_table(base_table, quality).tobytes(): quality
+    for base_table in (STANDARD_LUMINANCE_TABLE, ROBIDOUX_LUMINANCE_TABLE)
+    for quality in range(100, 0, -1)
+}
+
+# DQT segments store coefficients in zigzag order; entry k is the natural (row-major)
+# position of the k-th stored coefficient.
+_ZIGZAG_TO_NATURAL = np.array([
+     0,  1,  8, 16,  9,  2,  3, 10,
+    17, 24, 32, 25, 18, 11,  4,  5,
+    12, 19, 26, 33, 40, 48, 41, 34,
+    27, 20, 13,  6,  7, 14, 21, 28,
+    35, 42, 49, 56, 57, 50, 43, 36,
+    29, 22, 15, 23, 30, 37, 44, 51,
+    58, 59, 52, 45, 38, 31, 39, 46,
+    53, 60, 61, 54, 47, 55, 62, 63
+])
+
+def _scan_dqt(buf):
+    """Marker walk behind _read_dqt, over the file (or its first part) as a uint8 array.
+
+    Written as plain index loops so Numba can compile it (see _jit_scan_dqt).
+    Returns (table, header_end): table is the 8-bit luminance table 0 in natural
+    order, or an empty array if none was seen. header_end is the offset of the
+    first SOS marker, -1 if buf ends before it, or 0 if buf is not a JPEG marker
+    stream (or EOI comes first).
+    """
+    table = np.empty(0, dtype=np.uint8)
+    n = buf.shape[0]
+    if n < 2:
+        return table, -1
+    if buf[0] != 0xFF or buf[1] != 0xD8: # SOI
+        return table, 0
+    pos = 2
+    while pos + 4 <= n:
+        if buf[pos] != 0xFF:
+            return table, 0 # Lost sync with the marker stream
+        marker = buf[pos + 1]
+        if marker == 0xFF: # Fill byte before a marker
+            pos += 1
+            continue
+        if marker == 0xDA: # SOS: the header ends here
+            return table, pos
+        if marker == 0xD9: # EOI before any scan
+            return table, 0
+        length = int(buf[pos + 2]) * 256 + int(buf[pos + 3])
+        segment_end = pos + 2 + length
+        if segment_end > n:
+            return table, -1 # Segment runs past the end of the data
+        if marker == 0xDB and table.size == 0: # DQT, may hold several tables
+            table_pos = pos + 4
+            while table_pos < segment_end:
+                precision = int(buf[table_pos]) >> 4
+                table_id = int(buf[table_pos]) & 0x0F
+                table_end = table_pos + (65 if precision == 0 else 129)
+                if table_end > segment_end:
+                    break # Truncated table; segment_end <= n keeps every read in bounds
+                if precision == 0 and table_id == 0:
+                    table = np.empty(64, dtype=np.uint8)
+                    for k in range(64):
+                        table[_ZIGZAG_TO_NATURAL[k]] = buf[table_pos + 1 + k]
+                    break
+                table_pos = table_end
+        pos = segment_end
+    return table, -1
+
+@functools.lru_cache(maxsize=None)
+def _jit_scan_dqt():
+    """Returns _scan_dqt compiled with Numba, or the plain function if Numba is not installed.
+
+    Importing Numba costs more than scanning a single file, so one-shot CLI runs keep the
+    plain scanner; batch runs and the long-running Streamlit server use this one.
+    """
     try:
-        if isinstance(image_path_or_bytes, str):
-            img = Image.open(image_path_or_bytes)
-        elif isinstance(image_path_or_bytes, bytes):
-            img = Image.open(BytesIOModule.BytesIO(image_path_or_bytes))
-        else:
-            raise ValueError("Input must be a file path (str) or bytes.")
-
-        if img.format != 'JPEG':
-            # If not a JPEG, we can't get qtables. 
-            # We could try to save it as JPEG with high quality and then analyze,
-            # but for now, let's indicate it's not a JPEG or return a default.
-            # For this application, we primarily expect JPEGs for quality estimation.
-            # Or, we can return a high quality if it's a lossless format like PNG.
-            if img.format == 'PNG': # Assuming PNG is high quality
-                 return 98 # High quality for lossless like PNG
-            return 50 # Default for non-JPEG unidentified types
-
-        q_tables = img.quantization
-        if not q_tables:
-            # This can happen if the JPEG is malformed or uses a very unusual structure
-            print("Warning: Quantization tables not found in the image.")
-            return 50 # Default fallback
-
-        # Typically, table 0 is for luminance, table 1 for chrominance
-        # We'll focus on the luminance table for quality estimation
-        luminance_q_table = np.array(q_tables.get(0))
-        if luminance_q_table is None:
-            print("Warning: Luminance quantization table (0) not found.")
-            # Try to get any available table if 0 is not there
-            available_tables = list(q_tables.keys())
-            if not available_tables:
-                return 40 # Low fallback if no tables at all
-            luminance_q_table = np.array(q_tables.get(available_tables[0]))
-            print(f"Using quantization table {available_tables[0]} as fallback.")
-
-        # The core idea: JPEG quality scales the standard table.
-        # If Q_image[i,j] = S * Q_standard[i,j], then S is the scaling factor.
-        # For quality < 50, S = 5000 / (quality * Q_standard)
-        # For quality >= 50, S = (200 - 2 * quality) * Q_standard / 100
-        # We need to estimate S, then estimate quality.
-        # A simpler approach: find an average scaling factor.
-        # We must be careful with division by zero if standard table has zeros (it shouldn't for default JPEG tables).
-        
-        # Calculate mean ratio. Filter out any zeros in standard table if they exist.
-        non_zero_std_indices = STANDARD_LUMINANCE_TABLE != 0
-        if not np.any(non_zero_std_indices):
-            print("Error: Standard luminance table contains all zeros.")
-            return 30 # Error case
-
-        # Ensure luminance_q_table is also 1D for consistent comparison if it comes in a different shape
-        luminance_q_table_flat = luminance_q_table.flatten()
-        standard_luminance_table_flat_filtered = STANDARD_LUMINANCE_TABLE[non_zero_std_indices]
-        
-        # Ensure the image's qtable has the same number of elements for comparison
-        if len(luminance_q_table_flat) != len(STANDARD_LUMINANCE_TABLE):
-            # This can happen with non-standard JPEGs or an issue with table extraction
-            print(f"Warning: Image Q-table size ({len(luminance_q_table_flat)}) mismatches standard ({len(STANDARD_LUMINANCE_TABLE)}).")
-            # Fallback: Average value of the table. Higher average means lower quality.
-            avg_q_value = np.mean(luminance_q_table_flat)
-            # Simple heuristic: map avg_q_value (e.g. 2-200) to quality (100-1)
-            # This is a very rough estimate.
-            quality = max(1, min(100, int(110 - avg_q_value / 1.5)))
-            return quality
-
-        luminance_q_table_flat_filtered = luminance_q_table_flat[non_zero_std_indices]
-        avg_q_val = np.mean(luminance_q_table_flat_filtered)
-
-        if avg_q_val <= 10: quality = 95 - (avg_q_val - 1) # e.g. avg_val 1->95, 10->86
-        elif avg_q_val <= 20: quality = 90 - (avg_q_val - 10) * 1.5 # e.g. 20 -> 75
-        elif avg_q_val <= 50: quality = 75 - (avg_q_val - 20) * 1.0 # e.g. 50 -> 45
-        elif avg_q_val <= 100: quality = 45 - (avg_q_val - 50) * 0.6 # e.g. 100 -> 15
-        else: quality = 15 - (avg_q_val - 100) * 0.1 # very low
-        
-        quality = int(max(1, min(100, quality)))
+        from numba import njit
+    except ImportError:
+        return _scan_dqt
+    return njit(cache=True)(_scan_dqt)
+
+def _read_dqt(data: bytes, scan=_scan_dqt) -> Optional[np.ndarray]:
+    """Reads the 8-bit luminance quantization table straight from the JPEG markers.
+
+    Only segment headers are walked, so no PIL image is created and the scan data
+    is never touched. Returns the table in natural order, or None if the data is
+    not a JPEG or has no 8-bit table 0 before the first scan.
+    """
+    table, _ = scan(np.frombuffer(data, dtype=np.uint8))
+    return table if table.size else None
+
+_HEADER_CHUNK_SIZE = 64 * 1024
+
+def _read_dqt_from_file(f, scan=_scan_dqt):
+    """Like _read_dqt, but reads f in 64 KB chunks only until the table or the first scan is found.
+
+    Returns (the bytes read so far, the table or None).
+    """
+    data = b''
+    while True:
+        chunk = f.read(_HEADER_CHUNK_SIZE)
+        data += chunk
+        table, header_end = scan(np.frombuffer(data, dtype=np.uint8))
+        if table.size or header_end != -1 or not chunk:
+            return data, (table if table.size else None)
+
+def _jpeg_header_digest(data: bytes, scan=_scan_dqt) -> bytes:
+    """Cache key for image bytes that hashes only the JPEG header segments.
+
+    The quality estimate depends only on the segments before the first scan (SOS),
+    so the entropy-coded data, usually nearly all of the file, is skipped. Data
+    that does not parse as a JPEG header is hashed in full.
+    """
+    _, header_end = scan(np.frombuffer(data, dtype=np.uint8))
+    end = header_end if header_end > 0 else len(data)
+    return hashlib.blake2b(memoryview(data)[:end], digest_size=16).digest()
+
+def _read_qtable_with_pil(data):
+    """Fallback for inputs _read_dqt cannot handle (non-JPEG, 16-bit tables, unusual layouts).
+
+    Returns the luminance table as Pillow gives it (a flat sequence), or a fallback quality (int) if there is none.
+    """
+    img = Image.open(BytesIOModule.BytesIO(data))
+
+    if img.format != 'JPEG':
+        # If not a JPEG, we can't get qtables. 
+        # We could try to save it as JPEG with high quality and then analyze,
+        # but for now, let's indicate it's not a JPEG or return a default.
+        # For this application, we primarily expect JPEGs for quality estimation.
+        # Or, we can return a high quality if it's a lossless format like PNG.
+        if img.format == 'PNG': # Assuming PNG is high quality
+             return 98 # High quality for lossless like PNG
+        return 50 # Default for non-JPEG unidentified types
+
+    q_tables = img.quantization
+    if not q_tables:
+        # This can happen if the JPEG is malformed or uses a very unusual structure
+        return 50 # Default fallback
+
+    # Typically, table 0 is for luminance, table 1 for chrominance
+    # We'll focus on the luminance table for quality estimation
+    luminance_q_table = q_tables.get(0)
+    if luminance_q_table is None:
+        # Use whichever table is available if 0 is not there
+        luminance_q_table = next(iter(q_tables.values()))
+    return luminance_q_table
+
+def _lookup_stock_quality(table):
+    """Returns the quality setting if table is a stock libjpeg or mozjpeg table, else None."""
+    # Stock libjpeg tables: the DC entry indexes straight to the quality, confirmed by one comparison
+    quality = _Q_FROM_DC[table[0]]
+    if np.array_equal(table, _STD_SCALED_TABLES[quality - 1]):
+        return int(quality)
+    # Other stock encoder tables are recognised with a single lookup
+    return _KNOWN_TABLES.get(table.tobytes())
+
+def _quality_from_tables(tables):
+    """Estimates the quality for each row of an (N, 64) uint32 array of luminance tables (natural order)."""
+    filtered = tables[:, _STD_NONZERO_MASK]
+
+    # Invert the libjpeg (IJG) scaling: Q_image = (Q_std * scale + 50) / 100,
+    # where scale = 5000 / quality below 50 and 200 - 2 * quality from 50 up.
+    # scale = round(100 * Q_image / Q_std) is done in integers with floor division.
+    scales = (100 * filtered + _STD_FLAT_FILTERED // 2) // _STD_FLAT_FILTERED
+    # Entries clamped at 255 by baseline encoders say nothing about the scale, so they are
+    # left out, and the median of the rest shrugs off encoder-specific outliers.
+    unsaturated = filtered != 255
+    all_saturated = ~np.any(unsaturated, axis=1)
+    unsaturated[all_saturated] = True # Keeps nanmedian quiet; these rows are overridden below
+    scale = np.nanmedian(np.where(unsaturated, scales, np.nan), axis=1).astype(np.int64)
+
+    quality = np.where(scale <= 100,
+                       (200 - scale) // 2,
+                       (5000 + scale // 2) // np.maximum(scale, 1)) # Rounded integer division
+    quality[all_saturated] = 1 # Every coefficient is clamped: the lowest quality setting
+    return np.clip(quality, 1, 100)
+
+def get_jpeg_quality_from_qtable(image_path_or_bytes, scan_dqt=_scan_dqt):
+    """Estimates JPEG quality based on quantization tables.
+
+    scan_dqt is the marker scanner to use (_scan_dqt or the result of _jit_scan_dqt()).
+    Errors (missing file, unreadable image, bad input type) propagate to the caller.
+    """
+    # Fast path: read table 0 from the DQT marker without building a PIL image.
+    if isinstance(image_path_or_bytes, str):
+        with open(image_path_or_bytes, 'rb') as f:
+            data, luminance_q_table = _read_dqt_from_file(f, scan_dqt)
+            if luminance_q_table is None:
+                data += f.read() # The Pillow fallback needs the whole file
+    elif isinstance(image_path_or_bytes, bytes):
+        data = image_path_or_bytes
+        luminance_q_table = _read_dqt(data, scan_dqt)
+    else:
+        raise ValueError("Input must be a file path (str) or bytes.")
+
+    if luminance_q_table is None:
+        luminance_q_table = _read_qtable_with_pil(data)
+        if isinstance(luminance_q_table, int):
+            return luminance_q_table # Fallback quality for non-JPEG or table-less input
+    else:
+        stock_quality = _lookup_stock_quality(luminance_q_table)
+        if stock_quality is not None:
+            return stock_quality
+
+    # Ensure the image's qtable has the same number of elements for comparison
+    if len(luminance_q_table) != len(STANDARD_LUMINANCE_TABLE):
+        # This can happen with non-standard JPEGs or an issue with table extraction
+        # Fallback: Average value of the table. Higher average means lower quality.
+        # Plain Python sum: for a handful of values it beats np.mean's call overhead.
+        avg_q_value = sum(luminance_q_table) / len(luminance_q_table)
+        # Simple heuristic: map avg_q_value (e.g. 2-200) to quality (100-1)
+        # This is a very rough estimate.
+        quality = max(1, min(100, int(110 - avg_q_value / 1.5)))
         return quality
 
-    except UnidentifiedImageError:
-        print("Error: Cannot identify image file. It might be corrupted or not a supported format.")
-        return 20 # Low quality for unidentified files
-    except ValueError as ve:
-        print(f"ValueError: {ve}")
-        return 25
-    except Exception as e:
-        print(f"Error processing image for Q-table quality: {e}")
-        return 30 # Fallback quality
+    # Only materialize an array for the element-wise scales; asarray avoids a copy where it can.
+    # uint32 leaves room for 100 * Q_image even with 16-bit tables.
+    luminance_q_table_flat = np.asarray(luminance_q_table, dtype=np.uint32).reshape(1, -1)
+    return int(_quality_from_tables(luminance_q_table_flat)[0])
 
-# def estimate_jpeg_quality(image_array): # Old BRISQUE function - REMOVE
-#    ...
+# Lower bounds of each quality category above the lowest, and the category labels
+_QUALITY_THRESHOLDS = np.array([70, 80, 90])
+_QUALITY_LABELS = ("Very Low Quality", "Low Quality", "Medium Quality", "High Quality")
 
+@functools.lru_cache(maxsize=128)
 def classify_quality(score):
-    if score >= 90:
-        return "High Quality"
-    elif score >= 80:
-        return "Medium Quality"
-    elif score >= 70:
-        return "Low Quality"
-    else:
-        return "Very Low Quality"
+    return _QUALITY_LABELS[int(np.searchsorted(_QUALITY_THRESHOLDS, score, side='right'))]
+
+def classify_qualities(scores):
+    """Classifies a sequence of scores in one vectorized call."""
+    return [_QUALITY_LABELS[i] for i in np.searchsorted(_QUALITY_THRESHOLDS, scores, side='right')]
 
 def compress_image(input_path, output_path, quality):
     """Compresses an image and saves it as JPEG with the specified quality."""
     try:
         img = Image.open(input_path)
-        # Ensure the image is in RGB mode for JPEG saving, especially if it was PNG with alpha
-        if img.mode == 'RGBA' or img.mode == 'P': # P is for paletted images
+        # JPEG can store RGB and L directly; anything else (RGBA, P, CMYK, ...) needs converting
+        if img.mode not in ('RGB', 'L'):
             img = img.convert('RGB')
-        img.save(output_path, 'JPEG', quality=quality)
+        img.save(output_path, 'JPEG', quality=quality, optimize=True, progressive=True)
         print(f"Successfully compressed image saved to {output_path} with quality {quality}%")
     except Exception as e:
         print(f"Error compressing image: {e}")
 
+def compress_images(paths, out_dir, quality):
+    """Compresses several images in parallel, naming each output [name]_compressed_q[QUALITY].jpg.
+
+    Pillow releases the GIL inside the libjpeg encoder, so a thread pool scales across cores.
+    Outputs go to out_dir, or next to each input if out_dir is None. If two inputs would get
+    the same output name, the source extension is kept ([name]_[ext]_compressed_q[QUALITY].jpg);
+    inputs that still clash are skipped, as are inputs that are themselves one of the outputs
+    (e.g. left over from an earlier run in the same directory).
+    """
+    if out_dir:
+        if os.path.splitext(out_dir)[1] and not os.path.isdir(out_dir):
+            print(f"Error: --output must be a directory when compressing several files, got {out_dir}")
+            return
+        os.makedirs(out_dir, exist_ok=True)
+
+    def output_path_for(input_path, keep_extension):
+        base, ext = os.path.splitext(os.path.basename(input_path))
+        if keep_extension:
+            base = f"{base}_{ext.lstrip('.').lower()}"
+        return os.path.join(out_dir or os.path.dirname(input_path), f"{base}_compressed_q{quality}.jpg")
+
+    # Two threads writing the same file would race, so settle every output name up front
+    plain_paths = [output_path_for(input_path, False) for input_path in paths]
+    plain_counts = Counter(plain_paths)
+    outputs = {}
+    for input_path, plain_path in zip(paths, plain_paths):
+        output_path = plain_path if plain_counts[plain_path] == 1 else output_path_for(input_path, True)
+        if output_path in outputs:
+            print(f"Skipping {input_path}: output {output_path} is already used by {outputs[output_path]}")
+            continue
+        outputs[output_path] = input_path
+
+    # An input that is also an output would be read by one thread while another rewrites it
+    planned = {os.path.abspath(output_path) for output_path in outputs}
+    for output_path, input_path in list(outputs.items()):
+        if os.path.abspath(input_path) in planned:
+            print(f"Skipping {input_path}: it is the output of another input")
+            del outputs[output_path]
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for output_path, input_path in outputs.items():
+            executor.submit(compress_image, input_path, output_path, quality)
+
+def expand_paths(pattern):
+    """Returns the sorted files matching a glob pattern; an existing path is used as-is."""
+    # Names like img[1].jpg are valid file names but also glob character classes
+    if os.path.exists(pattern):
+        return [pattern]
+    return sorted(glob.glob(pattern))
+
 def main_cli(image_path):
     try:
-        # image = io.imread(image_path) # skimage.io not needed for qtable method with path
         estimated_quality_score = get_jpeg_quality_from_qtable(image_path)
         quality_category = classify_quality(estimated_quality_score)
 
@@ -148,23 +369,82 @@ def main_cli(image_path):
 
     except FileNotFoundError:
         print(f"Error: Image file not found at {image_path}")
+    except UnidentifiedImageError:
+        print(f"Error: Cannot identify image file {image_path}. It might be corrupted or not a supported format.")
     except Exception as e:
         print(f"Error processing image {image_path}: {e}")
 
+def main_cli_batch(image_paths, labels=None):
+    """Estimates and prints the quality of several images; returns how many were processed.
+
+    Tables are read file by file, then the scale estimation runs once over all of them.
+    Each result is printed under its entry in labels, or under its path if labels is None.
+    """
+    labels = dict(zip(image_paths, labels if labels is not None else image_paths))
+    scan_dqt = _jit_scan_dqt()
+    qualities = {}
+    errors = {}
+    tables = np.empty((len(image_paths), 64), dtype=np.uint32)
+    table_paths = []
+    for image_path in image_paths:
+        try:
+            with open(image_path, 'rb') as f:
+                data, table = _read_dqt_from_file(f, scan_dqt)
+                if table is None:
+                    data += f.read() # The Pillow fallback needs the whole file
+            stock_quality = None if table is None else _lookup_stock_quality(table)
+            if stock_quality is not None:
+                qualities[image_path] = stock_quality
+            elif table is not None:
+                tables[len(table_paths)] = table
+                table_paths.append(image_path)
+            else:
+                # Non-JPEG or unusual layout: take the single-image path
+                qualities[image_path] = get_jpeg_quality_from_qtable(data)
+        except Exception as e:
+            errors[image_path] = e
+
+    qualities.update(zip(table_paths, _quality_from_tables(tables[:len(table_paths)]).tolist()))
+    scored_paths = [image_path for image_path in image_paths if image_path in qualities]
+    categories = dict(zip(scored_paths, classify_qualities([qualities[image_path] for image_path in scored_paths])))
+
+    for image_path in image_paths:
+        error = errors.get(image_path)
+        if isinstance(error, UnidentifiedImageError):
+            print(f"\nError: Cannot identify image file {labels[image_path]}. It might be corrupted or not a supported format.")
+            continue
+        if error is not None:
+            print(f"\nError processing {labels[image_path]}: {error}")
+            continue
+        print(f"\nFile: {labels[image_path]}")
+        print(f"Estimated Quality: {qualities[image_path]:.2f}%")
+        print(f"Quality Category: {categories[image_path]}")
+    return len(qualities)
+
 def main_streamlit():
+    # Imported here so CLI runs don't pay Streamlit's import cost
+    import streamlit as st
+
+    # The server is long-lived, so the compiled scanner's one-off import and compile cost pays off
+    scan_dqt = _jit_scan_dqt()
+
+    # Streamlit reruns the script on every widget interaction, so memoize the estimate. The key is
+    # the header digest alone: Streamlit skips hashing arguments whose names start with an underscore.
+    @st.cache_data(max_entries=128)
+    def get_jpeg_quality_cached(header_digest, _image_bytes):
+        return get_jpeg_quality_from_qtable(_image_bytes, scan_dqt)
+
     st.title("JPEG Quality Estimator")
     uploaded_file = st.file_uploader("Choose a JPEG image", type=["jpg", "jpeg", "png"])
 
     if uploaded_file is not None:
         try:
-            image_bytes = uploaded_file.read()
-            # image = io.imread(image_bytes, plugin='imageio') # No longer need to load full image array for qtable method
-
-            st.image(image_bytes, caption="Uploaded Image.", use_container_width=True) # Display the uploaded bytes
+            st.image(uploaded_file, caption="Uploaded Image.", use_container_width=True) # Display the upload directly
             st.write("")
             st.write("Estimating quality...")
 
-            estimated_quality_score = get_jpeg_quality_from_qtable(image_bytes)
+            image_bytes = uploaded_file.getvalue() # Already-buffered bytes, no second read
+            estimated_quality_score = get_jpeg_quality_cached(_jpeg_header_digest(image_bytes, scan_dqt), image_bytes)
             quality_category = classify_quality(estimated_quality_score)
 
             st.write(f"Estimated Quality: {estimated_quality_score:.0f}%") # Q table usually gives integer quality
@@ -180,8 +460,6 @@ def process_directory(directory_path):
         return
 
     supported_extensions = {'.jpg', '.jpeg', '.png'}
-    total_files = 0
-    processed_files = 0
 
     print(f"\nAnalyzing images in directory: {directory_path}")
     print("-" * 50)
@@ -191,41 +469,39 @@ def process_directory(directory_path):
              if os.path.splitext(f)[1].lower() in supported_extensions]
     files.sort(key=lambda x: [int(c) if c.isdigit() else c.lower() for c in re.split('([0-9]+)', x)])
 
-    for filename in files:
-        total_files += 1
-        file_path = os.path.join(directory_path, filename)
-        try:
-            estimated_quality_score = get_jpeg_quality_from_qtable(file_path)
-            quality_category = classify_quality(estimated_quality_score)
-            print(f"\nFile: {filename}")
-            print(f"Estimated Quality: {estimated_quality_score:.2f}%")
-            print(f"Quality Category: {quality_category}")
-            processed_files += 1
-        except Exception as e:
-            print(f"\nError processing {filename}: {e}")
+    processed_files = main_cli_batch([os.path.join(directory_path, f) for f in files], labels=files)
 
     print("\n" + "=" * 50)
-    print(f"Processing complete. Analyzed {processed_files} out of {total_files} image files.")
+    print(f"Processing complete. Analyzed {processed_files} out of {len(files)} image files.")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='JPEG Quality Estimator and Compressor')
-    parser.add_argument('--file', type=str, help='Path to an image file to estimate quality.')
+    parser.add_argument('--file', type=str, help='Path or glob pattern of image files to estimate quality.')
     parser.add_argument('--dir', type=str, help='Path to a directory containing images to analyze.')
-    parser.add_argument('--compress', type=str, help='Path to an image file to compress.')
+    parser.add_argument('--compress', type=str, help='Path or glob pattern of image files to compress.')
     parser.add_argument('--quality', type=int, default=75, help='JPEG quality for compression (1-100).')
-    parser.add_argument('--output', type=str, help='Output path for the compressed image.')
+    parser.add_argument('--output', type=str, help='Output path for the compressed image (output directory when compressing several files).')
 
     args = parser.parse_args()
 
     if args.file:
-        main_cli(args.file)
+        file_paths = expand_paths(args.file)
+        if len(file_paths) > 1:
+            main_cli_batch(file_paths)
+        else:
+            main_cli(file_paths[0] if file_paths else args.file)
     elif args.dir:
         process_directory(args.dir)
     elif args.compress:
-        if not args.output:
-            # Default output name if not provided
-            base, ext = os.path.splitext(args.compress)
-            args.output = f"{base}_compressed_q{args.quality}.jpg"
-        compress_image(args.compress, args.output, args.quality)
+        input_paths = expand_paths(args.compress)
+        if len(input_paths) > 1:
+            compress_images(input_paths, args.output, args.quality)
+        else:
+            input_path = input_paths[0] if input_paths else args.compress
+            if not args.output:
+                # Default output name if not provided
+                base, ext = os.path.splitext(input_path)
+                args.output = f"{base}_compressed_q{args.quality}.jpg"
+            compress_image(input_path, args.output, args.quality)
     else:
         main_streamlit() 
\ No newline at end of file